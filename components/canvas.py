@@ -2,13 +2,14 @@ from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 import logging
-from components.custom_item import AddNodeMenu, PointBase, InputPoint, OutputPoint, Connection
+from components.custom_item import AddNodeMenu, CustomItem, Connection, MoveThrottle, PointIndex
 
-logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
 
 class CanvasView(QGraphicsView):
     MIN_SCALE = 0.1  # Минимальный коэффициент масштабирования
     MAX_SCALE = 10.0  # Максимальный коэффициент масштабирования
+    GRID_STEP = 100  # Шаг основной сетки
 
     def __init__(self, scene):
         super().__init__(scene)
@@ -16,14 +17,58 @@ class CanvasView(QGraphicsView):
         self.setRenderHint(QPainter.SmoothPixmapTransform, True)
         self.setDragMode(QGraphicsView.RubberBandDrag)
         self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+
+        # Растеризация на GPU: перерисовываем весь вьюпорт, не вычисляя грязные области.
+        # Без OpenGL (удалённые сессии, ВМ, сломанные драйверы) остаётся обычный растровый вьюпорт
+        gl_viewport = self.create_gl_viewport()
+        if gl_viewport is not None:
+            self.setViewport(gl_viewport)
+        self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
+        # Элементы сами задают кисть и перо в paint(), поэтому состояние painter сохранять не нужно
+        self.setOptimizationFlags(QGraphicsView.DontAdjustForAntialiasing | QGraphicsView.DontSavePainterState)
         self.middle_mouse_pressed = False
         self.last_pan_point = QPointF()
         self.current_connection = None
+        self.move_throttle = MoveThrottle(self.handle_mouse_move)
         self.add_node_menu = AddNodeMenu(self)
 
         self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
 
+        # Сетка рисуется один раз в тайл и тиражируется Qt через кисть фона
+        self.setBackgroundBrush(QBrush(self.create_grid_tile()))
+
+    @staticmethod
+    def create_gl_viewport():
+        surface_format = QSurfaceFormat()
+        surface_format.setSamples(4)  # Мультисэмплинг, иначе OpenGL рисует без сглаживания
+        # QOpenGLWidget без контекста ничего не рисует, поэтому сначала проверяем, что контекст создаётся
+        context = QOpenGLContext()
+        context.setFormat(surface_format)
+        if not context.create():
+            logger.warning("OpenGL context is unavailable, falling back to the raster viewport")
+            return None
+        viewport = QOpenGLWidget()
+        viewport.setFormat(surface_format)
+        # QGraphicsView не включает автозаливку для GL-вьюпорта, а без неё кадр не очищается
+        # и прозрачный тайл сетки рисуется поверх предыдущего кадра
+        viewport.setAutoFillBackground(True)
+        return viewport
+
+    @classmethod
+    def create_grid_tile(cls):
+        tile = QPixmap(cls.GRID_STEP, cls.GRID_STEP)
+        tile.fill(Qt.transparent)
+        painter = QPainter(tile)
+        painter.setPen(QPen(Qt.lightGray, 1))
+        minor_step = cls.GRID_STEP // 10
+        painter.drawLines([QLineF(i * minor_step, 0, i * minor_step, cls.GRID_STEP) for i in range(1, 10)] +
+                          [QLineF(0, i * minor_step, cls.GRID_STEP, i * minor_step) for i in range(1, 10)])
+        painter.setPen(QPen(Qt.gray, 1))
+        painter.drawLines([QLineF(0, 0, 0, cls.GRID_STEP), QLineF(0, 0, cls.GRID_STEP, 0)])
+        painter.end()
+        return tile
+
     def wheelEvent(self, event):
         angle = event.angleDelta().y()
         factor = 1.25 if angle > 0 else 0.8
@@ -33,11 +78,11 @@ class CanvasView(QGraphicsView):
 
     def mousePressEvent(self, event):
         item = self.itemAt(event.pos())
-        if isinstance(item, (InputPoint, OutputPoint)):
+        if getattr(item, 'is_connectable', False):
             self.current_connection = Connection(item)
             self.scene().addItem(self.current_connection)
             self.setCursor(QCursor(Qt.CrossCursor))
-            logging.debug(f"Started dragging from {item.name}")
+            logger.debug("Started dragging from %s", item.name)
         elif event.button() == Qt.MiddleButton:
             self.middle_mouse_pressed = True
             self.last_pan_point = event.pos()
@@ -48,29 +93,34 @@ class CanvasView(QGraphicsView):
             super().mousePressEvent(event)
 
     def mouseMoveEvent(self, event):
+        if self.middle_mouse_pressed or self.current_connection:
+            self.move_throttle.push(event.pos())
+            event.accept()
+        else:
+            super().mouseMoveEvent(event)
+
+    def handle_mouse_move(self, pos):
         if self.middle_mouse_pressed:
-            delta = self.mapToScene(event.pos()) - self.mapToScene(self.last_pan_point)
+            delta = self.mapToScene(pos) - self.mapToScene(self.last_pan_point)
             scale_factor = self.transform().m11()
-            self.last_pan_point = event.pos()
+            self.last_pan_point = pos
             self.horizontalScrollBar().setValue(int(self.horizontalScrollBar().value() - delta.x() * scale_factor))
             self.verticalScrollBar().setValue(int(self.verticalScrollBar().value() - delta.y() * scale_factor))
-            event.accept()
         elif self.current_connection:
-            self.current_connection.set_target_pos(self.mapToScene(event.pos()))
-        else:
-            super().mouseMoveEvent(event)
+            self.current_connection.set_target_pos(self.mapToScene(pos))
 
     def mouseReleaseEvent(self, event):
+        self.move_throttle.flush()  # Применяем последнее отложенное перемещение до отпускания
         if self.current_connection:
             scene_pos = self.mapToScene(event.pos())
-            target_item = self.scene().itemAt(scene_pos, self.transform())
-            logging.debug(f"Mouse released at {event.pos()}, target item: {target_item}")
-            if isinstance(target_item, (InputPoint, OutputPoint)) and target_item != self.current_connection.start_point:
+            target_item = self.scene().point_index.query_nearest(scene_pos, CustomItem.POINT_RADIUS * 2)
+            logger.debug("Mouse released at %s, target item: %s", event.pos(), target_item)
+            if target_item is not None and target_item != self.current_connection.start_point:
                 self.current_connection.set_target_point(target_item)
-                logging.debug(f"Connected {self.current_connection.start_point.name} to {target_item.name}")
+                logger.debug("Connected %s to %s", self.current_connection.start_point.name, target_item.name)
             else:
                 self.scene().removeItem(self.current_connection)
-                logging.debug(f"Connection from {self.current_connection.start_point.name} was canceled")
+                logger.debug("Connection from %s was canceled", self.current_connection.start_point.name)
             self.current_connection = None
             self.setCursor(QCursor(Qt.ArrowCursor))
         elif event.button() == Qt.MiddleButton:
@@ -79,39 +129,42 @@ class CanvasView(QGraphicsView):
         else:
             super().mouseReleaseEvent(event)
 
-    def drawBackground(self, painter, rect):
-        left = int(rect.left())
-        right = int(rect.right())
-        top = int(rect.top())
-        bottom = int(rect.bottom())
-        first_left = left - (left % 100)
-        first_top = top - (top % 100)
-        lines = []
-        x = first_left
-        while x < right:
-            lines.append(QLineF(x, top, x, bottom))
-            x += 100
-        y = first_top
-        while y < bottom:
-            lines.append(QLineF(left, y, right, y))
-            y += 100
-        painter.setPen(QPen(Qt.gray, 1))
-        painter.drawLines(lines)
-        small_lines = []
-        x = first_left
-        while x < right:
-            for i in range(1, 10):
-                small_x = x + i * 10
-                small_lines.append(QLineF(small_x, top, small_x, bottom))
-            x += 100
-        y = first_top
-        while y < bottom:
-            for i in range(1, 10):
-                small_y = y + i * 10
-                small_lines.append(QLineF(left, small_y, right, small_y))
-            y += 100
-        painter.setPen(QPen(Qt.lightGray, 0.1))
-        painter.drawLines(small_lines)
+class CanvasScene(QGraphicsScene):
+    BSP_INDEX_THRESHOLD = 1000  # Начиная с этого числа элементов BSP-дерево окупает своё обслуживание
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.point_index = PointIndex()  # Пространственный индекс точек для поиска цели соединения
+        self.item_count = 0  # Счётчик элементов вместо len(self.items()), который обходит всю сцену
+        self.index_update_pending = False
+        # Для небольших графов перестройка BSP-дерева при каждом перемещении дороже линейного поиска
+        self.setItemIndexMethod(QGraphicsScene.NoIndex)
+
+    # Элементы сами сообщают о входе в сцену и выходе из неё (см. track_scene_membership):
+    # дочерние точки попадают в сцену через setParentItem, минуя addItem
+    def item_added(self):
+        self.item_count += 1
+        self.schedule_index_update()
+
+    def item_removed(self):
+        self.item_count -= 1
+        self.schedule_index_update()
+
+    def schedule_index_update(self):
+        # Решение откладывается до возврата в цикл событий: пакет добавлений проверяется один раз,
+        # а индекс не переключается посреди addItem/removeItem
+        if not self.index_update_pending:
+            self.index_update_pending = True
+            QTimer.singleShot(0, self.update_index_method)
+
+    def update_index_method(self):
+        self.index_update_pending = False
+        item_count = self.item_count
+        if self.itemIndexMethod() == QGraphicsScene.NoIndex and item_count >= self.BSP_INDEX_THRESHOLD:
+            self.setItemIndexMethod(QGraphicsScene.BspTreeIndex)
+        elif self.itemIndexMethod() == QGraphicsScene.BspTreeIndex and item_count < self.BSP_INDEX_THRESHOLD // 2:
+            self.setItemIndexMethod(QGraphicsScene.NoIndex)
+
 
 class CustomTitleBar(QWidget):
     def __init__(self, parent=None):
@@ -149,7 +202,7 @@ class CanvasDock(QDockWidget):
     def __init__(self):
         super().__init__("Canvas")
         self.setTitleBarWidget(CustomTitleBar(self))  # Установить кастомный заголовок
-        self.scene = QGraphicsScene(self)
+        self.scene = CanvasScene(self)
         self.view = CanvasView(self.scene)
         self.setWidget(self.view)
         self.scene.setSceneRect(-1e6, -1e6, 2e6, 2e6)
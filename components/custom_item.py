@@ -1,10 +1,107 @@
-from PyQt5.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem, QMenu, QAction, QStyle, QGraphicsEllipseItem, QGraphicsPathItem
-from PyQt5.QtGui import QPen, QBrush, QColor, QPainter, QCursor, QPainterPath
-from PyQt5.QtCore import QRectF, QPointF, Qt
+from PyQt5.QtWidgets import QApplication, QGraphicsItem, QStyleOptionGraphicsItem, QMenu, QAction, QStyle, QGraphicsEllipseItem, QGraphicsPathItem
+from PyQt5.QtGui import QPen, QBrush, QColor, QPainter, QCursor, QPainterPath, QPainterPathStroker, QFontMetricsF
+from PyQt5.QtCore import QRectF, QPointF, Qt, QTimer, QObject, QRunnable, QThreadPool, pyqtSignal
 import os
 import sys
-import configparser
+import json
+import logging
 import importlib
+from functools import partial
+from components.settings_dialog import scripts_folder
+
+logger = logging.getLogger(__name__)
+
+_font_metrics = None
+_text_widths = {}  # Ширины строк: имена слотов меняются редко, измеряем каждую один раз
+
+
+def text_width(text):
+    global _font_metrics
+    width = _text_widths.get(text)
+    if width is None:
+        if _font_metrics is None:
+            _font_metrics = QFontMetricsF(QApplication.font())
+        width = _text_widths[text] = _font_metrics.horizontalAdvance(text)
+    return width
+
+
+class MoveThrottle:
+    INTERVAL_MS = 16  # Не чаще частоты обновления экрана (~60 Гц)
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.pending = None
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.INTERVAL_MS)
+        self.timer.timeout.connect(self.flush)
+
+    def push(self, value):
+        # Промежуточные значения перезаписываются, обработчик получит только последнее
+        self.pending = value
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        self.timer.stop()
+        if self.pending is not None:
+            value, self.pending = self.pending, None
+            self.callback(value)
+
+
+class PointIndex:
+    CELL_SIZE = 50  # Размер ячейки сетки, по которой раскладываются точки
+
+    def __init__(self):
+        self.cells = {}
+        self.positions = {}
+
+    def cell_of(self, x, y):
+        return int(x // self.CELL_SIZE), int(y // self.CELL_SIZE)
+
+    def update(self, point):
+        self.remove(point)
+        pos = point.scenePos()
+        x, y = pos.x(), pos.y()
+        self.cells.setdefault(self.cell_of(x, y), set()).add(point)
+        self.positions[point] = (x, y)
+
+    def remove(self, point):
+        position = self.positions.pop(point, None)
+        if position is not None:
+            cell = self.cell_of(*position)
+            bucket = self.cells[cell]
+            bucket.discard(point)
+            if not bucket:
+                del self.cells[cell]
+
+    def query_nearest(self, pos, radius):
+        # Проверяем только ячейки, пересекающие квадрат поиска, а не все точки сцены
+        x, y = pos.x(), pos.y()
+        min_cx, min_cy = self.cell_of(x - radius, y - radius)
+        max_cx, max_cy = self.cell_of(x + radius, y + radius)
+        nearest = None
+        nearest_distance = radius * radius
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                for point in self.cells.get((cx, cy), ()):
+                    px, py = self.positions[point]
+                    distance = (px - x) ** 2 + (py - y) ** 2
+                    if distance <= nearest_distance:
+                        nearest, nearest_distance = point, distance
+        return nearest
+
+
+def track_scene_membership(item, change):
+    # Сцена ведёт счётчик элементов по уведомлениям самих элементов, а не по addItem/removeItem
+    if change == QGraphicsItem.ItemSceneChange:
+        item_removed = getattr(item.scene(), 'item_removed', None)
+        if item_removed is not None:
+            item_removed()
+    elif change == QGraphicsItem.ItemSceneHasChanged:
+        item_added = getattr(item.scene(), 'item_added', None)
+        if item_added is not None:
+            item_added()
 
 
 class CustomItem(QGraphicsItem):
@@ -16,12 +113,11 @@ class CustomItem(QGraphicsItem):
         self.setFlag(QGraphicsItem.ItemIsMovable, True)
         self.setFlag(QGraphicsItem.ItemIsSelectable, True)
         self.setFlag(QGraphicsItem.ItemSendsGeometryChanges, True)
-        self.start_pos = QPointF()
-        self.mouse_start_pos = QPointF()
-        self.selected_items_start_pos = {}
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
         self.node_instance = node_class()
         self.input_points = []
         self.output_points = []
+        self.slot_widths = {}
         self.width = 150
         self.height = 100
 
@@ -29,25 +125,32 @@ class CustomItem(QGraphicsItem):
         self.create_input_output_points()
 
     def create_input_output_points(self):
-        self.input_points.clear()
-        self.output_points.clear()
-        self._create_points(self.node_instance.get_inputs(), self.input_points, QPointF(0, 40))
-        self._create_points(self.node_instance.get_outputs(), self.output_points, QPointF(self.width, 40))
+        self._create_points(self.node_instance.get_inputs(), self.input_points, QPointF(0, 40), InputPoint)
+        self._create_points(self.node_instance.get_outputs(), self.output_points, QPointF(self.width, 40), OutputPoint)
 
-    def _create_points(self, slots, points_list, initial_pos):
+    def _create_points(self, slots, points_list, initial_pos, point_cls):
+        # Существующие точки переиспользуем и лишь сдвигаем, новые создаём только для добавленных слотов
+        x0 = initial_pos.x()
         slot_y = initial_pos.y()
-        for slot in slots:
-            point = InputPoint(self, slot, initial_pos.x(), slot_y) if points_list == self.input_points else OutputPoint(self, slot, initial_pos.x(), slot_y)
-            points_list.append(point)
+        for i, slot in enumerate(slots):
+            if i < len(points_list):
+                point = points_list[i]
+                point.name = slot
+                point.setPos(x0, slot_y)
+            else:
+                points_list.append(point_cls(self, slot, x0, slot_y))
             slot_y += 20
+        for point in points_list[len(slots):]:
+            point.setParentItem(None)
+            if point.scene():
+                point.scene().removeItem(point)
+        del points_list[len(slots):]
 
     def update_size(self):
-        painter = QPainter()
-        font_metrics = painter.fontMetrics()
-
-        max_input_width = max([font_metrics.width(text) for text in self.node_instance.get_inputs()] or [0])
-        max_output_width = max([font_metrics.width(text) for text in self.node_instance.get_outputs()] or [0])
-        node_name_width = font_metrics.width(self.node_instance.name)
+        self.slot_widths = {text: text_width(text) for text in self.node_instance.get_inputs() + self.node_instance.get_outputs()}
+        max_input_width = max([self.slot_widths[text] for text in self.node_instance.get_inputs()] or [0])
+        max_output_width = max([self.slot_widths[text] for text in self.node_instance.get_outputs()] or [0])
+        node_name_width = text_width(self.node_instance.name)
 
         self.width = max(max_input_width + max_output_width + 40, node_name_width + 20)
         self.height = max(len(self.node_instance.get_inputs()), len(self.node_instance.get_outputs())) * 20 + 40
@@ -56,6 +159,10 @@ class CustomItem(QGraphicsItem):
     def boundingRect(self) -> QRectF:
         return QRectF(0, 0, self.width, self.height)
 
+    def itemChange(self, change, value):
+        track_scene_membership(self, change)
+        return super().itemChange(change, value)
+
     def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget=None):
         self._set_painter_brush_and_pen(painter, option)
         painter.drawRect(self.boundingRect())
@@ -77,7 +184,15 @@ class CustomItem(QGraphicsItem):
     def _draw_slot_texts(self, painter, slots, initial_pos, align_right=False):
         slot_y = initial_pos.y()
         for slot in slots:
-            text_pos = QPointF(initial_pos.x() - painter.boundingRect(QRectF(0, 0, self.width / 2, 20), Qt.AlignLeft, slot).width(), slot_y + 5) if align_right else QPointF(initial_pos.x(), slot_y + 5)
+            if align_right:
+                # Скрипт узла может поменять слоты напрямую, минуя update_size, поэтому ширину
+                # отсутствующей в кэше строки измеряем на месте: исключение в paint() роняет процесс
+                slot_width = self.slot_widths.get(slot)
+                if slot_width is None:
+                    slot_width = text_width(slot)
+                text_pos = QPointF(initial_pos.x() - slot_width, slot_y + 5)
+            else:
+                text_pos = QPointF(initial_pos.x(), slot_y + 5)
             painter.drawText(text_pos, slot)
             slot_y += 20
 
@@ -95,62 +210,104 @@ class CustomItem(QGraphicsItem):
 
 
 class PointBase(QGraphicsEllipseItem):
-    def __init__(self, parent, name, color, x, y):
+    COLOR = QColor(0, 0, 0)  # Подклассы отличаются только цветом
+    is_connectable = True  # Признак, что от элемента можно тянуть соединение
+
+    def __init__(self, parent, name, x, y):
         diameter = CustomItem.POINT_RADIUS * 2
-        super().__init__(-CustomItem.POINT_RADIUS, -CustomItem.POINT_RADIUS, diameter, diameter, parent)
-        self.setBrush(QBrush(color))
+        super().__init__(-CustomItem.POINT_RADIUS, -CustomItem.POINT_RADIUS, diameter, diameter)
+        self.setBrush(QBrush(self.COLOR))
         self.setPen(QPen(QColor(0, 0, 0)))
         self.setFlag(QGraphicsItem.ItemIsMovable, False)
         self.setFlag(QGraphicsItem.ItemIsSelectable, False)
         self.setFlag(QGraphicsItem.ItemSendsScenePositionChanges, True)
         self.setZValue(10)  # Устанавливаем z-значение выше других элементов
         self.name = name
-        self.setPos(QPointF(x, y))
+        self.setPos(x, y)
+        # Родитель назначается после конструктора: иначе точка попадает в сцену родителя
+        # до того, как начинает работать itemChange, и не учитывается сценой
+        self.setParentItem(parent)
+
+    def itemChange(self, change, value):
+        track_scene_membership(self, change)
+        # Держим индекс точек сцены в актуальном состоянии
+        if change == QGraphicsItem.ItemSceneChange:
+            point_index = getattr(self.scene(), 'point_index', None)
+            if point_index is not None:
+                point_index.remove(self)
+        elif change in (QGraphicsItem.ItemSceneHasChanged, QGraphicsItem.ItemScenePositionHasChanged):
+            point_index = getattr(self.scene(), 'point_index', None)
+            if point_index is not None:
+                point_index.update(self)
+        return super().itemChange(change, value)
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             self.connection = Connection(self)
             self.scene().addItem(self.connection)
+            self.move_throttle = MoveThrottle(self.connection.set_target_pos)
             self.setZValue(20)  # Поднимаем точку при перетаскивании
-            print(f"Started dragging from {self.name}")
+            logger.debug("Started dragging from %s", self.name)
         super().mousePressEvent(event)
 
     def mouseMoveEvent(self, event):
         if hasattr(self, 'connection'):
-            self.connection.set_target_pos(event.scenePos())
+            self.move_throttle.push(event.scenePos())
         super().mouseMoveEvent(event)
 
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.LeftButton and hasattr(self, 'connection'):
-            target_point = self.scene().itemAt(event.scenePos(), self.scene().views()[0].transform())
-            if isinstance(target_point, PointBase) and target_point != self:
+            self.move_throttle.flush()
+            target_point = self.scene().point_index.query_nearest(event.scenePos(), CustomItem.POINT_RADIUS * 2)
+            if target_point is not None and target_point != self:
                 self.connection.set_target_point(target_point)
                 self.connections.append(self.connection)
                 target_point.connections.append(self.connection)
-                print(f"Connected {self.name} to {target_point.name}")
+                logger.debug("Connected %s to %s", self.name, target_point.name)
             else:
                 self.scene().removeItem(self.connection)
-                print(f"Connection from {self.name} was canceled")
+                logger.debug("Connection from %s was canceled", self.name)
             del self.connection
+            del self.move_throttle
             self.setZValue(10)  # Возвращаем z-значение
         super().mouseReleaseEvent(event)
 
 class InputPoint(PointBase):
-    def __init__(self, parent, name, x, y):
-        super().__init__(parent, name, QColor(255, 0, 0), x, y)
+    COLOR = QColor(255, 0, 0)
 
 class OutputPoint(PointBase):
-    def __init__(self, parent, name, x, y):
-        super().__init__(parent, name, QColor(0, 255, 0), x, y)
+    COLOR = QColor(0, 255, 0)
+
+def cubic_point(p0, p1, p2, p3, t):
+    u = 1 - t
+    return p0 * (u * u * u) + p1 * (3 * u * u * t) + p2 * (3 * u * t * t) + p3 * (t * t * t)
+
 
 class Connection(QGraphicsPathItem):
+    SHAPE_SAMPLES = 10  # Число отрезков ломаной, аппроксимирующей кривую для попаданий
+
     def __init__(self, start_point):
         super().__init__()
         self.start_point = start_point
         self.end_point = None
         self.target_pos = start_point.scenePos()
+        self.bounding_rect = QRectF()
+        self.shape_path = QPainterPath()
         self.setPen(QPen(QColor(0, 0, 0), 2))
+        self.stroker = QPainterPathStroker()
+        self.stroker.setWidth(self.pen().widthF() + 4)
         self.setZValue(-1)  # Устанавливаем z-значение ниже других элементов
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+
+    def boundingRect(self) -> QRectF:
+        return self.bounding_rect
+
+    def shape(self) -> QPainterPath:
+        return self.shape_path
+
+    def itemChange(self, change, value):
+        track_scene_membership(self, change)
+        return super().itemChange(change, value)
 
     def set_target_pos(self, pos):
         self.target_pos = pos
@@ -161,67 +318,151 @@ class Connection(QGraphicsPathItem):
         self.update_path()
 
     def update_path(self):
-        path = QPainterPath()
         start_pos = self.start_point.scenePos()
         end_pos = self.target_pos if self.end_point is None else self.end_point.scenePos()
-        path.moveTo(start_pos)
-        dx = (end_pos.x() - start_pos.x()) / 2
-        path.cubicTo(start_pos.x() + dx, start_pos.y(), end_pos.x() - dx, end_pos.y(), end_pos.x(), end_pos.y())
+        sx, sy, ex, ey = start_pos.x(), start_pos.y(), end_pos.x(), end_pos.y()
+        dx = (ex - sx) * 0.5
+        path = QPainterPath(QPointF(sx, sy))
+        path.cubicTo(sx + dx, sy, ex - dx, ey, ex, ey)
+        # Контур для проверки попаданий строим один раз по ломаной из точек кривой,
+        # чтобы Qt не разбивал кубическую кривую на отрезки при каждом запросе
+        polyline = QPainterPath(QPointF(sx, sy))
+        for i in range(1, self.SHAPE_SAMPLES + 1):
+            t = i / self.SHAPE_SAMPLES
+            polyline.lineTo(cubic_point(sx, sx + dx, ex - dx, ex, t), cubic_point(sy, sy, ey, ey, t))
+        self.prepareGeometryChange()
+        self.shape_path = self.stroker.createStroke(polyline)
+        # Контрольные точки лежат между концами, поэтому кривая целиком внутри их прямоугольника.
+        # Углы квадратных концов контура попаданий выступают дальше половины его ширины,
+        # поэтому границы берутся по самому контуру, объединённому с прямоугольником кривой с учётом пера
+        margin = self.pen().widthF() / 2
+        self.bounding_rect = self.shape_path.boundingRect().united(
+            QRectF(min(sx, ex) - margin, min(sy, ey) - margin, abs(ex - sx) + 2 * margin, abs(ey - sy) + 2 * margin))
         self.setPath(path)
 
+
+# Индекс скриптов узлов: для каждого файла mtime и найденные в нём классы узлов
+NODE_INDEX_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'imagefactory', 'node_index.json')
+
+
+def load_node_index():
+    try:
+        with open(NODE_INDEX_PATH, 'r', encoding='utf-8') as index_file:
+            return json.load(index_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_node_index(index):
+    try:
+        os.makedirs(os.path.dirname(NODE_INDEX_PATH), exist_ok=True)
+        with open(NODE_INDEX_PATH, 'w', encoding='utf-8') as index_file:
+            json.dump(index, index_file)
+    except OSError as e:
+        logger.warning("Failed to save node index %s: %s", NODE_INDEX_PATH, e)
+
+
+class TaskSignals(QObject):
+    finished = pyqtSignal(object)
+
+
+class BackgroundTask(QRunnable):
+    def __init__(self, function, fallback=None):
+        super().__init__()
+        self.function = function
+        self.fallback = fallback  # Результат при ошибке: необработанное исключение в потоке пула роняет PyQt5
+        self.signals = TaskSignals()
+
+    def run(self):
+        try:
+            result = self.function()
+        except Exception:
+            logger.exception("Background task %s failed", self.function)
+            result = self.fallback
+        # Сигнал испускается из пула потоков и доставляется в GUI-поток через очередь событий
+        self.signals.finished.emit(result)
+
+
 class AddNodeMenu:
     def __init__(self, view):
         self.view = view
         self.node_base_class = None
-        self.node_classes = self.load_node_classes()
+        self.node_classes = {}
+        self.menu = QMenu(self.view)
+        self.menu.addAction('Loading...').setEnabled(False)
+
+        # Импорт скриптов узлов не задерживает показ окна
+        self.load_task = BackgroundTask(self.load_node_classes, fallback={})
+        self.load_task.signals.finished.connect(self.set_node_classes)
+        QThreadPool.globalInstance().start(self.load_task)
 
     def load_node_classes(self):
         node_classes = {}
-        config = configparser.ConfigParser()
-        config.read('user.cfg')
-        script_dir = config.get('Settings', 'scripts_folder', fallback='')
+        script_dir = scripts_folder()
 
-        if not script_dir or not os.path.exists(script_dir):
-            print(f"Invalid script directory: {script_dir}")
+        # Один вызов listdir и проверяет каталог, и читает его, без отдельного os.path.exists
+        try:
+            filenames = os.listdir(script_dir) if script_dir else None
+        except OSError:
+            filenames = None
+        if filenames is None:
+            logger.warning("Invalid script directory: %s", script_dir)
             return node_classes
 
-        print(f"Script directory: {script_dir}")
-        sys.path.append(script_dir)
+        logger.debug("Script directory: %s", script_dir)
+        if script_dir not in sys.path:
+            sys.path.append(script_dir)
 
         try:
             node_base_module = importlib.import_module('node_base')
             self.node_base_class = node_base_module.NodeBase
-            print(f"Loaded NodeBase from {node_base_module.__file__}")
+            logger.debug("Loaded NodeBase from %s", node_base_module.__file__)
         except ModuleNotFoundError:
-            print("Base node class 'NodeBase' not found in script directory.")
+            logger.warning("Base node class 'NodeBase' not found in script directory.")
             return node_classes
 
-        for filename in os.listdir(script_dir):
+        node_index = load_node_index()
+        for filename in filenames:
             if filename.endswith(".py") and filename != 'node_base.py':
                 module_name = filename[:-3]
+                file_path = os.path.abspath(os.path.join(script_dir, filename))
+                mtime = os.stat(file_path).st_mtime_ns
+                cached = node_index.get(file_path)
+                # Неизменившиеся файлы без классов узлов повторно не импортируем
+                if cached is not None and cached['mtime'] == mtime and not cached['classes']:
+                    logger.debug("Skipping %s: no node classes since last scan", module_name)
+                    continue
+                found = []
                 try:
                     module = importlib.import_module(module_name)
                     for name, obj in module.__dict__.items():
-                        print(f"Checking {name} in {module_name}")
+                        logger.debug("Checking %s in %s", name, module_name)
                         if isinstance(obj, type) and issubclass(obj, self.node_base_class) and obj is not self.node_base_class:
                             node_classes[name] = obj
-                            print(f"Loaded node class {name} from {module.__file__}")
+                            found.append(name)
+                            logger.debug("Loaded node class %s from %s", name, module.__file__)
                 except ModuleNotFoundError as e:
-                    print(f"Failed to import module {module_name}: {e}")
-        print(f"Total loaded node classes: {len(node_classes)}")
+                    logger.warning("Failed to import module %s: %s", module_name, e)
+                    continue
+                node_index[file_path] = {'mtime': mtime, 'classes': found}
+        save_node_index(node_index)
+        logger.debug("Total loaded node classes: %d", len(node_classes))
         return node_classes
 
-    def show_context_menu(self, position):
-        context_menu = QMenu(self.view)
+    def set_node_classes(self, node_classes):
+        self.node_classes = node_classes
+        self.populate_menu()
+
+    def populate_menu(self):
+        # Меню строится один раз, а не при каждом щелчке правой кнопкой
+        self.menu.clear()
         for node_class in self.node_classes.values():
-            action = QAction(node_class.__name__, self.view)
-            action.triggered.connect(lambda checked, nc=node_class: self.add_node(nc))
-            context_menu.addAction(action)
-
-        global_position = self.view.mapToGlobal(position)
-        print(f"Global position for context menu: {global_position}")
-        context_menu.exec_(global_position)
-        print("Context menu displayed")
+            action = QAction(node_class.__name__, self.menu)
+            action.triggered.connect(partial(self.add_node, node_class))
+            self.menu.addAction(action)
+
+    def show_context_menu(self, position):
+        self.menu.exec_(self.view.mapToGlobal(position))
 
     def add_node(self, node_class):
         item = CustomItem(node_class)
@@ -1,7 +1,60 @@
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QPushButton, QFileDialog, QLineEdit, QHBoxLayout, QSpacerItem, \
     QSizePolicy
+from PyQt5.QtCore import QSettings
 import configparser
+import logging
 import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = 'user.cfg'
+CONFIG_FORMAT_VERSION = 2  # Файлы, записанные configparser, этого ключа не содержат
+
+_migration_lock = threading.Lock()
+_migration_done = False
+
+
+def migrate_legacy_config():
+    # configparser писал значения без кавычек и экранирования: QSettings разбил бы запятые в список
+    # и съел обратные слеши, поэтому один раз перечитываем такой файл как есть и переписываем через QSettings
+    global _migration_done
+    with _migration_lock:
+        if _migration_done:
+            return
+        _migration_done = True
+        if not os.path.exists(CONFIG_PATH):
+            return
+        settings = QSettings(CONFIG_PATH, QSettings.IniFormat)
+        settings.setIniCodec('UTF-8')
+        if settings.contains('Settings/format_version'):
+            return
+        config = configparser.ConfigParser(interpolation=None)
+        try:
+            config.read(CONFIG_PATH, encoding='utf-8')
+        except (configparser.Error, UnicodeDecodeError) as e:
+            logger.warning("Failed to read legacy settings %s: %s", CONFIG_PATH, e)
+            return
+        if config.has_option('Settings', 'scripts_folder'):
+            settings.setValue('Settings/scripts_folder', config.get('Settings', 'scripts_folder'))
+        settings.setValue('Settings/format_version', CONFIG_FORMAT_VERSION)
+        settings.sync()
+
+
+def user_settings():
+    # Тот же user.cfg в формате INI; Qt сам кэширует разобранный файл и перечитывает его при изменении
+    migrate_legacy_config()
+    settings = QSettings(CONFIG_PATH, QSettings.IniFormat)
+    settings.setIniCodec('UTF-8')
+    return settings
+
+
+def scripts_folder():
+    value = user_settings().value('Settings/scripts_folder', '')
+    # Значение с запятыми без кавычек QSettings возвращает списком строк
+    if isinstance(value, list):
+        value = ', '.join(value)
+    return value
 
 
 class SettingsDialog(QDialog):
@@ -50,22 +103,15 @@ class SettingsDialog(QDialog):
             self.folder_path_line_edit.setText(folder_path)
 
     def save_settings(self):
-        config = configparser.ConfigParser()
-        config['Settings'] = {
-            'scripts_folder': self.folder_path_line_edit.text()
-        }
-
-        with open('user.cfg', 'w') as configfile:
-            config.write(configfile)
+        settings = user_settings()
+        settings.setValue('Settings/scripts_folder', self.folder_path_line_edit.text())
+        settings.setValue('Settings/format_version', CONFIG_FORMAT_VERSION)
+        settings.sync()
 
         self.accept()  # Закрыть диалоговое окно после сохранения
 
     def load_settings(self):
-        config = configparser.ConfigParser()
-        if os.path.exists('user.cfg'):
-            config.read('user.cfg')
-            if 'Settings' in config:
-                self.folder_path_line_edit.setText(config['Settings'].get('scripts_folder', ''))
+        self.folder_path_line_edit.setText(scripts_folder())
 
 
 if __name__ == '__main__':
@@ -1,14 +1,18 @@
 from PyQt5.QtWidgets import QApplication, QMainWindow, QAction
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QFile, QIODevice, QTextStream
 from functools import partial
 import sys
 import os
+import logging
+from pathlib import Path
 from components.settings_dialog import SettingsDialog
 from components.parameters import ParametersDock
 from components.image_viewer import ImageViewerDock
 from components.text_editor import TextEditorDock
 from components.canvas import CanvasDock
 
+logger = logging.getLogger(__name__)
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -45,30 +49,38 @@ class MainWindow(QMainWindow):
             'Canvas': CanvasDock(),
         }
 
-        # Add Dock Widgets to specific areas
+        # Add Dock Widgets to specific areas in one batch, so the window lays out and repaints once
+        self.setUpdatesEnabled(False)
+        for frame in self.frames.values():
+            frame.blockSignals(True)
         self.addDockWidget(Qt.LeftDockWidgetArea, self.frames['Parameters'])
         self.addDockWidget(Qt.RightDockWidgetArea, self.frames['Canvas'])
         self.addDockWidget(Qt.LeftDockWidgetArea, self.frames['Image Viewer'])
         self.addDockWidget(Qt.RightDockWidgetArea, self.frames['Text Editor'])
+        for frame in self.frames.values():
+            frame.blockSignals(False)
+        self.setUpdatesEnabled(True)
+        self.update()
 
         # Window Menu Items
         self.window_actions = {}
+        self.toggle_callbacks = {frame_name: partial(self.toggle_frame, frame_name) for frame_name in self.frame_states}
         for frame_name in self.frame_states.keys():
             action = QAction(frame_name, self)
             action.setCheckable(True)  # Make the menu item "checkable"
             action.setChecked(
                 self.frame_states[frame_name])  # Set the initial state of the checkbox based on frame_states
-            action.triggered.connect(partial(self.toggle_frame, frame_name))
+            action.triggered.connect(self.toggle_callbacks[frame_name])
             window_menu.addAction(action)
             self.window_actions[frame_name] = action
 
-        # Connect visibilityChanged signal to update_menu
+        # Connect each frame's visibilityChanged signal to its own menu item
         for frame_name, frame in self.frames.items():
-            frame.visibilityChanged.connect(self.update_menu)
+            frame.visibilityChanged.connect(partial(self.sync_frame_action, frame_name))
 
-    def update_menu(self):
-        for frame_name, action in self.window_actions.items():
-            action.setChecked(self.frames[frame_name].isVisible())
+    def sync_frame_action(self, frame_name, visible):
+        self.window_actions[frame_name].setChecked(visible)
+        self.frame_states[frame_name] = visible
 
     def showEvent(self, event):
         super().showEvent(event)
@@ -77,10 +89,10 @@ class MainWindow(QMainWindow):
             action.setChecked(self.frames[frame_name].isVisible())
 
     def new_factory(self):
-        print("New Factory clicked")
+        logger.debug("New Factory clicked")
 
     def new_node(self):
-        print("New Node clicked")
+        logger.debug("New Node clicked")
 
     def open_settings_dialog(self):
         settings_dialog = SettingsDialog()
@@ -88,25 +100,45 @@ class MainWindow(QMainWindow):
 
     def toggle_frame(self, frame_name):
         frame = self.frames[frame_name]
-        frame.setVisible(not frame.isVisible())
-        self.frame_states[frame_name] = frame.isVisible()
+        visible = not frame.isVisible()
+        frame.setVisible(visible)
 
         # Update menu
-        action = self.window_actions[frame_name]
-        action.setChecked(frame.isVisible())
+        self.sync_frame_action(frame_name, visible)
 
 
 # Получите путь к директории, в которой находится текущий скрипт
-script_directory = os.path.dirname(os.path.abspath(__file__))
+script_directory = Path(__file__).resolve().parent
+
+# Прочитанные таблицы стилей по пути вместе с mtime файла
+_stylesheet_cache = {}
+
+
+def load_stylesheet(path):
+    mtime = os.stat(path).st_mtime_ns
+    cached = _stylesheet_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    stylesheet_file = QFile(path)
+    if not stylesheet_file.open(QIODevice.ReadOnly | QIODevice.Text):
+        raise OSError(f"Cannot open stylesheet: {path}")
+    stream = QTextStream(stylesheet_file)
+    stream.setCodec("UTF-8")
+    stylesheet = stream.readAll()
+    stylesheet_file.close()
+    _stylesheet_cache[path] = (mtime, stylesheet)
+    return stylesheet
+
 
 if __name__ == '__main__':
+    # Доки используют нативное окно главного окна, а частые события мыши сжимаются Qt
+    QApplication.setAttribute(Qt.AA_DontCreateNativeWidgetSiblings, True)
+    QApplication.setAttribute(Qt.AA_CompressHighFrequencyEvents, True)
     app = QApplication(sys.argv)
 
     # Загрузка стиля из файла style.qss с использованием относительного пути
-    script_directory = os.path.dirname(os.path.abspath(__file__))
-    stylesheet_path = os.path.join(script_directory, 'style.qss')
-    with open(stylesheet_path, 'r') as stylesheet_file:
-        app.setStyleSheet(stylesheet_file.read())
+    stylesheet_path = script_directory / 'style.qss'
+    app.setStyleSheet(load_stylesheet(str(stylesheet_path)))
 
     window = MainWindow()
     window.show()
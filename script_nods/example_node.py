@@ -1,19 +1,28 @@
+import logging
 from node_base import NodeBase
 
+logger = logging.getLogger(__name__)
+
 class ExampleNode(NodeBase):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(name="Example Node")
-        self.inputs.append("File Input")
-        self.inputs.append("Fileфаы Iффыаnpпвut")
-        self.inputs.append("Fileфыа Inывпput")
-        self.inputs.append("Filфыаe Inpаut")
-        self.inputs.append("Filфвe фаInput")
-        self.inputs.append("File ффывыаInput")
-        self.inputs.append("File фыаInпывput")
-        self.inputs.append("Fisdgsdgnфыввыявput")
-        self.outputs.append("Processed Oварutput")
-        self.outputs.append("Processed Outpварврut")
-        self.outputs.append("Proceфыввssed Output")
-        self.outputs.append("Proceфыв ssed Output")
-        self.outputs.append("Processварed Ouварtput")
-        print("ExampleNode created")
+        self.add_inputs([
+            "File Input",
+            "Fileфаы Iффыаnpпвut",
+            "Fileфыа Inывпput",
+            "Filфыаe Inpаut",
+            "Filфвe фаInput",
+            "File ффывыаInput",
+            "File фыаInпывput",
+            "Fisdgsdgnфыввыявput",
+        ])
+        self.add_outputs([
+            "Processed Oварutput",
+            "Processed Outpварврut",
+            "Proceфыввssed Output",
+            "Proceфыв ssed Output",
+            "Processварed Ouварtput",
+        ])
+        logger.debug("ExampleNode created")
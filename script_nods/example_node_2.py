@@ -1,8 +1,13 @@
+import logging
 from node_base import NodeBase
 
+logger = logging.getLogger(__name__)
+
 class ExampleNode2(NodeBase):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__(name="Example Node 2")
-        self.inputs = ["[хуй]"]
-        self.outputs = ["Output 1"]
-        print("ExampleNode2 created")
+        self.add_inputs(["[хуй]"])
+        self.add_outputs(["Output 1"])
+        logger.debug("ExampleNode2 created")
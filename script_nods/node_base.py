@@ -1,17 +1,54 @@
 class NodeBase:
+    # Без __dict__ у каждого экземпляра; подклассам без своих атрибутов достаточно __slots__ = ()
+    __slots__ = ("name", "inputs", "outputs", "_input_index", "_output_index")
+
     def __init__(self, name="Unnamed Node"):
         self.name = name
         self.inputs = []
         self.outputs = []
+        # Индексы слотов по имени для поиска за O(1)
+        self._input_index = {}
+        self._output_index = {}
 
     def add_input(self, name):
+        self._input_index[name] = len(self.inputs)
         self.inputs.append(name)
 
     def add_output(self, name):
+        self._output_index[name] = len(self.outputs)
         self.outputs.append(name)
 
+    def add_inputs(self, names):
+        names = list(names)
+        base = len(self.inputs)
+        self.inputs.extend(names)
+        self._input_index.update({name: base + i for i, name in enumerate(names)})
+
+    def add_outputs(self, names):
+        names = list(names)
+        base = len(self.outputs)
+        self.outputs.extend(names)
+        self._output_index.update({name: base + i for i, name in enumerate(names)})
+
     def get_inputs(self):
         return self.inputs
 
     def get_outputs(self):
         return self.outputs
+
+    def get_input_index(self, name):
+        self._input_index = self._checked_index(self._input_index, self.inputs, name)
+        return self._input_index[name]
+
+    def get_output_index(self, name):
+        self._output_index = self._checked_index(self._output_index, self.outputs, name)
+        return self._output_index[name]
+
+    @staticmethod
+    def _checked_index(index, slots, name):
+        # Подклассы могут менять список напрямую (в том числе без изменения длины),
+        # поэтому найденная позиция сверяется со списком, а при расхождении индекс перестраивается
+        i = index.get(name)
+        if i is None or i >= len(slots) or slots[i] != name:
+            index = {slot: i for i, slot in enumerate(slots)}
+        return index